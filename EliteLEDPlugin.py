@@ -19,16 +19,22 @@
 # - Game events only apply LED side-effect (source: "game") and do NOT cause assistant replies
 
 from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from datetime import datetime, timezone
+import math
 import threading
 import time
-from typing import Any, Dict, Tuple, Literal
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Tuple, Literal, Sequence, get_args
 from pathlib import Path
 import sys
 from pydantic.main import BaseModel
 
-sys.path.append(str(Path(__file__).parent / "deps"))
+# Vendored dependencies; guarded so plugin reloads don't keep growing sys.path
+_DEPS = str(Path(__file__).parent / "deps")
+if _DEPS not in sys.path:
+    sys.path.append(_DEPS)
 
 from . import elite_led_controller as led
 
@@ -40,34 +46,104 @@ from lib.PluginSettingDefinitions import (
 from lib.Event import Event, ProjectedEvent, GameEvent, StatusEvent
 from lib.EventManager import Projection
 from lib.Logger import log
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 
 
 __version__ = "4.0.0-production"
 RELEASE_TITLE = "Pydantic Ocelot — Production"
 
+_UTC = timezone.utc
+_now = datetime.now
+_fromtimestamp = datetime.fromtimestamp
+
+def _iso_now() -> str:
+    return _now(_UTC).isoformat()
+
+# Plugin event names that carry an LED state change
+_LED_EVENTS = frozenset({"LEDChanged"})
+# Shared immutable "no projected events" result
+_EMPTY: tuple = ()
+# set_led_color reply when the device can't be reached
+_UNREACHABLE = "LED device unreachable; check IP/configuration."
+# automatic retries of one failed intent before giving up until the next LED change
+_MAX_LED_RETRIES = 5
+
 PLUGIN_LOG_LEVEL = "WARN"  # Options: DEBUG, INFO, WARN, ERROR
 _LEVELS = {"DEBUG": 10, "INFO": 20, "WARN": 30, "ERROR": 40}
 
-color_options = list(led.COLORS.keys())
-speed_options = list(led.SPEEDS.keys())
+# Game/status event names that share an LED mapping key
+_EVENT_ALIASES = {
+    "FuelScoopStarted": "FuelScoopStart",
+    "FuelScoopEnded": "FuelScoopEnd",
+}
 
-def p_log(level: str, *args):
-    try:
-        lvl = _LEVELS.get(level.upper(), 999)
-        threshold = _LEVELS.get(PLUGIN_LOG_LEVEL.upper(), 999)
-        if lvl >= threshold:
-            log(level, "[EliteLEDPlugin]", *args)
-    except Exception:
+# (LED map key, setting key, default color/scene, speed) for every mapped event
+_EVENT_DEFAULTS: tuple[tuple[str, str, str, str], ...] = (
+    ("LoadGame", "PreferredColor", "white", "normal"),
+    ("Shutdown", "Shutdown", "white", "normal"),
+    ("StartJump", "StartJump", "fsd_jump", "normal"),
+    ("DockingGranted", "DockingGranted", "white", "normal"),
+    ("Undocked", "Undocked", "yellow", "normal"),
+    ("UnderAttack", "UnderAttack", "red_alert", "fast"),
+    ("Docked", "Docked", "white", "normal"),
+    ("FuelScoopStart", "FuelScoopStart", "breathing_yellow", "normal"),
+    ("FuelScoopEnd", "FuelScoopEnd", "white", "normal"),
+    ("SupercruiseExit", "SupercruiseExit", "white", "normal"),
+)
+
+# Color/scene and speed names never change after import; materialize them once
+_COLOR_KEYS: tuple[str, ...] = tuple(led.COLORS)
+_SPEED_KEYS: tuple[str, ...] = tuple(led.SPEEDS)
+# Settings UI select options for every color/scene, shared by all event selects
+COLOR_OPTIONS: tuple[dict, ...] = tuple(
+    {"key": c, "label": c.capitalize(), "value": c, "disabled": False} for c in _COLOR_KEYS
+)
+
+def _with_subclasses(*roots: type) -> frozenset:
+    """Every class in the given hierarchies, for exact-class membership tests."""
+    seen = set()
+    todo = list(roots)
+    while todo:
+        cls = todo.pop()
+        if cls not in seen:
+            seen.add(cls)
+            todo.extend(cls.__subclasses__())
+    return frozenset(seen)
+
+def _noop(*args):
+    pass
+
+def _make_logger(level: str):
+    """Bind a logger for one level once; levels below PLUGIN_LOG_LEVEL get a no-op."""
+    if _LEVELS[level] < _LEVELS.get(PLUGIN_LOG_LEVEL.upper(), 999):
+        return _noop
+
+    def _emit(*args):
         try:
-            log("ERROR", "[EliteLEDPlugin] logging failure")
+            log(level, "[EliteLEDPlugin]", *args)
         except Exception:
             pass
+    return _emit
+
+_debug = _make_logger("DEBUG")
+_info = _make_logger("INFO")
+_warn = _make_logger("WARN")
+_error = _make_logger("ERROR")
+# hot paths test this before building debug f-strings that would be discarded
+_DEBUG = _debug is not _noop
+
+# Closed value sets for the action: validated by pydantic-core, and exported as enums in the schema
+ColorName = Literal[("off", "on", *_COLOR_KEYS)]
+SpeedName = Literal[_SPEED_KEYS]
+# set_led_color description, registered again on every chat start
+_SET_LED_DESCRIPTION = f"Set the LED strip to a color or scene, Available colors: {', '.join(get_args(ColorName))}"
 
 # --- Classes for BaseModel definitions ---
 class SetLedColorParameters(BaseModel):
-    color: str
-    speed: str = "normal"
+    model_config = ConfigDict(frozen=True)
+
+    color: ColorName
+    speed: SpeedName = "normal"
 
 class CurrentLEDStateModel(BaseModel):
     event: str = "LEDState"
@@ -87,33 +163,64 @@ class CurrentLEDState(Projection[CurrentLEDStateModel]):
             last_update=None
         )
 
-    def process(self, event: Event) -> list[ProjectedEvent]:
-        if isinstance(event, PluginEvent) and getattr(event, "plugin_event_name", "") == "LEDChanged":
-            data = event.plugin_event_content or {}
-            new_color = data.get("new_color", "off")
-            speed = data.get("speed", "normal")
-            ts = data.get("timestamp", datetime.now(timezone.utc).isoformat())
-            self.state = self.StateModel(
-                event=self.state.event,
-                color=new_color,
-                speed=speed,
-                last_update=ts
-            )
-        return []  # No need to create additional projected events
+    def process(self, event: Event) -> Sequence[ProjectedEvent]:
+        # exact type check: this runs for every event, and only PluginEvent instances are dispatched
+        if type(event) is not PluginEvent or event.plugin_event_name not in _LED_EVENTS:
+            return _EMPTY
+        data = event.plugin_event_content or {}
+        new_color = data.get("new_color", "off")
+        speed = data.get("speed", "normal")
+        state = self.state
+        if state.color == new_color and state.speed == speed:
+            # same LED state: keep the model (and its last_update) instead of rebuilding it
+            return _EMPTY
+        ts = data.get("timestamp") or _iso_now()
+        self.state = self.StateModel(
+            event=state.event,
+            color=new_color,
+            speed=speed,
+            last_update=ts
+        )
+        return _EMPTY  # No need to create additional projected events
 
 # --- Main Plugin ---
 class EliteLEDPlugin(PluginBase):
+    # grid prefixes tried after the bare key when reading a setting
+    _KEY_PREFIXES = ("tuya_device.", "event_colors.")
+
     def __init__(self, plugin_manifest: PluginManifest):
         super().__init__(plugin_manifest)
-        self._led_lock = threading.Lock()
-        self._worker_threads: list[threading.Thread] = []
-        self._stop_workers = False
+        # last (color, speed) the device acknowledged; None until then and after a
+        # failed write. Only the worker sets it.
+        self._current_led: Tuple[str, str] | None = None
+        # monotonic time of that acknowledgement; the skip below expires with the
+        # controller's LAST_SENT_TTL so a repeat re-syncs a strip changed elsewhere
+        self._current_led_time = 0.0
+        # single-slot "latest wins" mailbox drained by a one-thread executor
+        self._pending: tuple | None = None
+        # (color, speed) the worker is writing right now; guarded by _pending_lock
+        self._inflight: Tuple[str, str] | None = None
+        # re-queues the last failed intent once the device cooldown ends
+        self._retry_timer: threading.Timer | None = None
+        # automatic retries spent on the current intent; reset by a new intent or a success
+        self._retry_count = 0
+        self._pending_lock = threading.Lock()
+        self._drain_scheduled = False
+        self._led_pool: ThreadPoolExecutor | None = None
+        # device configured while no worker was running; opened once the worker starts
+        self._prewarm_wanted = False
+        # the worker waits this long before its first read so an event burst settles on one write
+        self._coalesce_s = 0.08
+        # (id, ip, key, version) last passed to led.configure; reconfiguring drops the device socket
+        self._cfg_sig: tuple | None = None
+        # helper from the current chat; used by the registered sideeffect and by actions
+        self._last_helper: PluginHelper | None = None
+        # ISO timestamp reused for every LED change within the same second (worker-only)
+        self._last_iso_sec = -1
+        self._last_iso_str = ""
 
-        try:
-            color_keys = list(led.COLORS.keys())
-        except Exception:
-            color_keys = ["off", "white"]
-        self.color_options = [{"key": c, "label": c.capitalize(), "value": c, "disabled": False} for c in color_keys]
+        # one list object (over the shared option dicts) referenced by every SelectSetting
+        self.color_options = list(COLOR_OPTIONS)
 
         self.settings_config = PluginSettings(
             key="EliteLEDController",
@@ -130,6 +237,7 @@ class EliteLEDPlugin(PluginBase):
                         TextSetting(key="device_ip", label="Device IP", type="text"),
                         TextSetting(key="local_key", label="Local Key", type="text"),
                         TextSetting(key="device_ver", label="Device Version", type="text", default_value="3.3"),
+                        TextSetting(key="coalesce_ms", label="Update Coalesce Window (ms)", type="text", default_value="80"),
                     ]
                 ),
                 SettingsGrid(
@@ -152,7 +260,11 @@ class EliteLEDPlugin(PluginBase):
             ]
         )
 
-        self._event_led_map: Dict[str, Tuple[str, str]] = {}
+        self._event_led_map: Mapping[str, Tuple[str, str]] = MappingProxyType({})
+        # pre-bound lookup on the dict behind _event_led_map, for the per-event dispatch
+        self._event_lookup = self._event_led_map.get
+        # event classes handle_game_event accepts; refreshed on helper ready
+        self._game_event_classes = _with_subclasses(GameEvent, StatusEvent)
 
     # --- Utility to convert LED state to description for LLM ---
     def _get_led_status_description(self, states) -> str:
@@ -168,90 +280,115 @@ class EliteLEDPlugin(PluginBase):
         return f"The LED strip is currently {state.color} (speed: {state.speed})."
     
     # --- Utility to read settings ---
-    def _get_setting(self, key: str, default: Any = None) -> Any:
+    def _settings_view(self) -> Dict[str, Any]:
+        # rebuilt on every call: the host may mutate self.settings in place
+        return self._build_flat_settings(getattr(self, "settings", None))
+
+    def _build_flat_settings(self, settings) -> Dict[str, Any]:
+        # Index both "grid.key" and bare "key"; an exact key wins over prefixed ones,
+        # then prefixes in _KEY_PREFIXES order. Empty values count as unset.
+        flat: Dict[str, Any] = {}
         try:
-            if hasattr(self, "settings") and self.settings is not None:
-                val = self.settings.get(key, None)
-                if val not in (None, ""):
-                    return val
-                if "." not in key:
-                    for prefix in ("tuya_device", "event_colors", ""):
-                        composed = f"{prefix}.{key}" if prefix else key
-                        val = self.settings.get(composed, None)
-                        if val not in (None, ""):
-                            return val
+            items = [(k, v) for k, v in settings.items() if v not in (None, "")] if settings is not None else []
         except Exception:
-            pass
-        return default
+            items = []
+        flat.update(items)
+        for prefix in self._KEY_PREFIXES:
+            n = len(prefix)
+            for k, v in items:
+                if k.startswith(prefix) and "." not in k[n:]:
+                    flat.setdefault(k[n:], v)
+        return flat
 
     # --- Configure Tuya & event mapping ---
     def on_plugin_helper_ready(self, helper: PluginHelper):
-        device_id = self._get_setting("device_id", "")
-        device_ip = self._get_setting("device_ip", "")
-        local_key = self._get_setting("local_key", "")
+        # flatten the current settings once and read every key from that view
+        get = self._settings_view().get
+        device_id = get("device_id", "")
+        device_ip = get("device_ip", "")
+        local_key = get("local_key", "")
         try:
-            device_ver = float(self._get_setting("device_ver", "3.3"))
+            device_ver = float(get("device_ver", "3.3"))
         except Exception:
             device_ver = 3.3
         try:
-            led.configure(device_id=device_id, device_ip=device_ip, local_key=local_key, device_ver=device_ver)
-            p_log("INFO", f"Configured LED controller (ver={device_ver}) id={device_id} ip={device_ip}")
-        except Exception as e:
-            p_log("ERROR", f"Failed to configure led controller: {e}")
-
-        # Build event->LED mapping
-        self._event_led_map = {
-            "LoadGame": (self._get_setting("PreferredColor", "white"), "normal"),
-            "Shutdown": (self._get_setting("Shutdown", "white"), "normal"),
-            "StartJump": (self._get_setting("StartJump", "fsd_jump"), "normal"),
-            "DockingGranted": (self._get_setting("DockingGranted", "white"), "normal"),
-            "Undocked": (self._get_setting("Undocked", "yellow"), "normal"),
-            "UnderAttack": (self._get_setting("UnderAttack", "red_alert"), "fast"),
-            "Docked": (self._get_setting("Docked", "white"), "normal"),
-            "FuelScoopStart": (self._get_setting("FuelScoopStart", "breathing_yellow"), "normal"),
-            "FuelScoopEnd": (self._get_setting("FuelScoopEnd", "white"), "normal"),
-            "SupercruiseExit": (self._get_setting("SupercruiseExit", "white"), "normal"),
+            coalesce_ms = float(get("coalesce_ms", "80"))
+            if not math.isfinite(coalesce_ms):
+                raise ValueError(coalesce_ms)
+            self._coalesce_s = min(max(coalesce_ms, 0.0), 1000.0) / 1000.0
+        except Exception:
+            self._coalesce_s = 0.08
+        sig = (device_id, device_ip, local_key, device_ver)
+        if sig != self._cfg_sig:
+            try:
+                led.configure(device_id=device_id, device_ip=device_ip, local_key=local_key, device_ver=device_ver)
+                self._cfg_sig = sig
+                _info(f"Configured LED controller (ver={device_ver}) id={device_id} ip={device_ip}")
+                # connect to the device now, on the LED worker, so the first event finds the socket open
+                self._prewarm_device()
+            except Exception as e:
+                _error(f"Failed to configure led controller: {e}")
+
+        # Build event->LED mapping; published read-only so handlers can't mutate it
+        event_led_map = {
+            event: (sys.intern(str(get(setting, color))), sys.intern(speed))
+            for event, setting, color, speed in _EVENT_DEFAULTS
         }
+        self._event_led_map = MappingProxyType(event_led_map)
+        self._event_lookup = event_led_map.get
+        # picks up GameEvent/StatusEvent subclasses defined since import
+        self._game_event_classes = _with_subclasses(GameEvent, StatusEvent)
 
     # --- On chat start ---
     def on_chat_start(self, helper: PluginHelper):
         self._last_helper = helper
+        # worker first, so the device (re)configured below is opened in the background
+        self._start_worker()
         self.on_plugin_helper_ready(helper)
         self.register_actions(helper)
         helper.register_projection(CurrentLEDState())
     #    helper.register_status_generator(lambda states: [("Current LED state", states.get("CurrentLEDState", {}))])
-        helper.register_status_generator(lambda states: [("Current LED status", self._get_led_status_description(states))])
+        helper.register_status_generator(self._status_generator)
         # Sideeffect: handle game/status events
- 
-        def sideeffect(event, states):
-            try:
-                self.handle_game_event(helper, event, states)
-            except Exception as e:
-                log("error", f"[EliteLEDPlugin] Sideeffect error: {e}")
-
-        helper.register_sideeffect(sideeffect)
+        helper.register_sideeffect(self._sideeffect)
 # --- No need to register event that triggers assistant replies --- It already replies to direct command, set_led_color
 #        helper.register_event(
 #            name="LEDChanged",
 #            should_reply_check=lambda event: self._should_reply_to_led_event(event),
 #            prompt_generator=lambda event: self._generate_led_prompt(event)
 #        )
-        p_log("INFO", "EliteLEDPlugin ready")
+        _info("EliteLEDPlugin ready")
+
+    # bound methods rather than closures: the helper comes from self._last_helper
+    def _status_generator(self, states):
+        return [("Current LED status", self._get_led_status_description(states))]
+
+    def _sideeffect(self, event, states):
+        try:
+            self.handle_game_event(self._last_helper, event, states)
+        except Exception as e:
+            log("error", f"[EliteLEDPlugin] Sideeffect error: {e}")
+
     def on_chat_stop(self, helper: PluginHelper):
-        self._stop_workers = True
-        for t in list(self._worker_threads):
-            try:
-                if t.is_alive():
-                    t.join(timeout=0.5)
-            except Exception:
-                pass
-        p_log("INFO", "EliteLEDPlugin stopped")
+        with self._pending_lock:
+            self._pending = None
+            pool, self._led_pool = self._led_pool, None
+            retry, self._retry_timer = self._retry_timer, None
+        if retry is not None:
+            retry.cancel()
+        if pool is not None:
+            # give an in-flight write at most 0.5s in total, then let it finish in the background
+            stopper = threading.Thread(target=pool.shutdown, kwargs={"wait": True, "cancel_futures": True},
+                                       name="LEDWorkerShutdown", daemon=True)
+            stopper.start()
+            stopper.join(timeout=0.5)
+        _info("EliteLEDPlugin stopped")
 
     # --- Actions ---
     def register_actions(self, helper: PluginHelper):
         helper.register_action(
             name="set_led_color",
-            description=f"Set the LED strip to a color or scene, Available colors: {', '.join(color_options)}",
+            description=_SET_LED_DESCRIPTION,
             parameters=SetLedColorParameters,  # Passa la classe del modello, non un'istanza
             method=self.set_led_method,  # Nuovo metodo che accetta un modello Pydantic
             action_type="global"  # Mantieni lo stesso action_type
@@ -262,94 +399,186 @@ class EliteLEDPlugin(PluginBase):
         color = model.color
         speed = model.speed
     
-        # Usa la logica esistente di set_led
-        if not color:
-            return "Missing color."
+        # color/speed are already validated against ColorName/SpeedName by the model
         try:
-            if not led.is_reachable():
-                p_log("WARN", "Device unreachable (action).")
-                return "LED device unreachable; check IP/configuration."
+            # cached verdict only: the LED worker does the real probe before writing
+            if not led.is_reachable(probe=False):
+                _warn("Device unreachable (action).")
+                return _UNREACHABLE
         except Exception:
-            return "LED device unreachable; check IP/configuration."
+            return _UNREACHABLE
     
         # Ottieni helper dal contesto o usa quello passato
         helper = context.get("helper", None)
         if helper is None:
             helper = self._last_helper  # Potresti voler memorizzare l'helper in una variabile di classe
     
-        self._apply_led(color, speed, helper, context, source="manual")
+        self._apply_led(color, speed, helper, source="manual")
         return f"LED update queued: color={color}, speed={speed}"
 
     # --- Handle game/status events ---
     def handle_game_event(self, helper, event, states):
-        if hasattr(event, "content") and isinstance(event.content, dict) and event.content.get("event") == "LEDChanged":
+        if event.__class__ not in self._game_event_classes:
+            # plugin/conversation/tool events never map to an LED; one hash probe rejects them
             return
-    
-        event_name = None
-    
-        # Check if this is a status event with FuelScoopStarted/FuelScoopEnded
-        if hasattr(event, "status") and isinstance(event.status, dict) and "event" in event.status:
-            event_name = event.status["event"]
-    
-        # If not a status event, check if it's a regular game event
-        if not event_name and hasattr(event, "content") and isinstance(event.content, dict):
-            event_name = event.content.get("event")
-    
-        if not event_name:
+        status = getattr(event, "status", None)
+        content = getattr(event, "content", None)
+        if not isinstance(content, dict):
+            content = None
+
+        # Status events (FuelScoopStarted/FuelScoopEnded) take precedence over journal content
+        event_name = status.get("event") if isinstance(status, dict) else None
+        if not event_name and content is not None:
+            event_name = content.get("event")
+
+        if not event_name or event_name in _LED_EVENTS:
             return
-    
-        key = event_name
-    
-        # Handle FuelScoopStarted / FuelScoopEnded
-        if event_name in ("FuelScoopStarted", "FuelScoopEnded"):
-            p_log("DEBUG", f"Detected {event_name} event")
-            key = "FuelScoopStart" if event_name == "FuelScoopStarted" else "FuelScoopEnd"
-        elif event_name == "FuelScoop":
-            p_log("DEBUG", "Processing FuelScoop event")
-            content = getattr(event, "content", {})
-            if isinstance(content, dict):
-                scooped = content.get("Scooped", 0)
-                key = "FuelScoopStart" if scooped > 0 else "FuelScoopEnd"
-                p_log("DEBUG", f"FuelScoop event detected, scooped={scooped}, key={key}")
-    
-        if key in self._event_led_map:
-            color, speed = self._event_led_map[key]
-            p_log("DEBUG", f"Applying LED for event {event_name}: color={color}, speed={speed}")
-            self._apply_led(color, speed, helper, states, source="game")
+
+        key = _EVENT_ALIASES.get(event_name, event_name)
+        # Legacy journal FuelScoop: direction depends on the scooped amount
+        if key == "FuelScoop" and content is not None:
+            scooped = content.get("Scooped", 0)
+            key = "FuelScoopStart" if scooped > 0 else "FuelScoopEnd"
+            if _DEBUG:
+                _debug(f"FuelScoop event detected, scooped={scooped}, key={key}")
+
+        mapping = self._event_lookup(key)
+        if mapping is not None:
+            color, speed = mapping
+            if _DEBUG:
+                _debug(f"Applying LED for event {event_name}: color={color}, speed={speed}")
+            self._apply_led(color, speed, helper, source="game")
 
     # --- Internal LED application ---
-    def _apply_led(self, color: str, speed: str, helper: PluginHelper, states: Dict[str, Dict], source: str = "game"):
-        try:
-            current_state = states.get("CurrentLEDState", {})
-            if current_state.get("color") == color and current_state.get("speed") == speed:
+    def _apply_led(self, color: str, speed: str, helper: PluginHelper, source: str = "game") -> None:
+        with self._pending_lock:
+            if (self._pending is None and self._inflight is None and self._current_led == (color, speed)
+                    and time.monotonic() - self._current_led_time < led.LAST_SENT_TTL):
+                # just written and nothing else queued or being written
                 return
-        except Exception:
-            pass
+            # a newer intent replaces any retry of an older failed one
+            retry, self._retry_timer = self._retry_timer, None
+            self._retry_count = 0
+            self._enqueue_locked((color, speed, helper, source))
+        if retry is not None:
+            retry.cancel()
+
+    def _enqueue_locked(self, item: tuple) -> None:
+        # overwrite any update the worker hasn't picked up yet; caller holds _pending_lock
+        self._pending = item
+        if self._drain_scheduled or self._led_pool is None:
+            return
+        self._drain_scheduled = True
+        self._led_pool.submit(self._drain_pending)
+
+    def _schedule_retry(self, delay: float, item: tuple) -> None:
+        timer = threading.Timer(delay, self._retry_intent, args=(item,))
+        timer.daemon = True
+        with self._pending_lock:
+            # chat stopped, a newer intent is already queued, or this one is out of retries
+            if self._led_pool is None or self._pending is not None or self._retry_count >= _MAX_LED_RETRIES:
+                return
+            self._retry_count += 1
+            old, self._retry_timer = self._retry_timer, timer
+            timer.start()
+        if old is not None:
+            old.cancel()
+
+    def _retry_intent(self, item: tuple) -> None:
+        with self._pending_lock:
+            # only if no newer intent arrived meanwhile and the chat is still running
+            if self._retry_timer is not threading.current_thread():
+                return
+            self._retry_timer = None
+            if self._pending is None and self._inflight is None:
+                if _DEBUG:
+                    _debug(f"Retrying LED {item[0]} after device failure")
+                self._enqueue_locked(item)
 
-        def worker():
-            threading.current_thread().name = f"LEDWorker-{color}-{int(time.time())}"
+    # --- LED worker ---
+    def _start_worker(self):
+        with self._pending_lock:
+            if self._led_pool is None:
+                self._led_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="LEDWorker")
+                self._drain_scheduled = False
+                if self._prewarm_wanted:
+                    # configured before the worker existed: open the device now
+                    self._prewarm_wanted = False
+                    self._led_pool.submit(self._open_device)
+
+    def _prewarm_device(self):
+        with self._pending_lock:
+            if self._led_pool is not None:
+                self._led_pool.submit(self._open_device)
+            else:
+                # no worker yet (chat not started): _start_worker picks this up
+                self._prewarm_wanted = True
+
+    def _open_device(self):
+        # TCP probe, BulbDevice setup and socket connect, paid here instead of on the first LED change
+        try:
+            led.warm_up()
+        except Exception as e:
+            _error(f"Failed to open LED device: {e}")
+
+    def _drain_pending(self):
+        # an error escaping this worker would leave _drain_scheduled stuck and LEDs frozen
+        try:
+            if self._coalesce_s:
+                # let the rest of a burst land in the slot; only its final intent is written
+                time.sleep(self._coalesce_s)
+        except Exception as e:
+            _error(f"LED worker error: {e}")
+        while True:
+            with self._pending_lock:
+                item = self._pending
+                self._pending = None
+                if item is None:
+                    self._inflight = None
+                    self._drain_scheduled = False
+                    return
+                self._inflight = item[:2]
+            color, speed, helper, source = item
+            # device I/O happens outside the lock so producers never block on it
             try:
-                with self._led_lock:
-                    success = led.set_led(color, speed)
+                self._send_led(color, speed, helper, source)
             except Exception as e:
-                p_log("ERROR", f"Exception while setting LED: {e}")
-                success = False
-            if success:
-                evt = PluginEvent(
-                    plugin_event_name="LEDChanged",
-                    plugin_event_content={
-                        "new_color": color,
-                        "speed": speed,
-                        "timestamp": datetime.now(timezone.utc).isoformat(),
-                        "source": source
-                    },
-                    processed_at=time.time()
-                )
-                helper.dispatch_event(evt)
+                # keep draining
+                _error(f"LED worker error: {e}")
 
-        t = threading.Thread(target=worker, daemon=True)
-        t.start()
-        self._worker_threads.append(t)
+    def _send_led(self, color: str, speed: str, helper: PluginHelper, source: str) -> None:
+        try:
+            success = led.set_led(color, speed)
+        except Exception as e:
+            _error(f"Exception while setting LED: {e}")
+            success = False
+        if not success:
+            # strip state is unknown now, so the same color must not be deduplicated
+            self._current_led = None
+            delay = led.retry_delay()
+            if delay is not None:
+                # device failure: write this intent again once the cooldown ends
+                self._schedule_retry(delay, (color, speed, helper, source))
+            return
+        self._current_led = (color, speed)
+        self._current_led_time = time.monotonic()
+        self._retry_count = 0
+        now = time.time()
+        sec = int(now)
+        if sec != self._last_iso_sec:
+            self._last_iso_sec = sec
+            self._last_iso_str = _fromtimestamp(now, _UTC).isoformat()
+        evt = PluginEvent(
+            plugin_event_name="LEDChanged",
+            plugin_event_content={
+                "new_color": color,
+                "speed": speed,
+                "timestamp": self._last_iso_str,
+                "source": source
+            },
+            processed_at=now
+        )
+        helper.dispatch_event(evt)
 
     # --- Assistant reply policy ---
 #    def _should_reply_to_led_event(self, event: PluginEvent) -> bool:
@@ -71,9 +71,9 @@ def main():
             print(f"Scene Mode (DPS 21): {dps['21']}")
         
         # Check for scene data
-        scene_keys = [k for k in dps.keys() if k in ['25', '26', '27', '28', '29']]
-        for key in scene_keys:
-            print(f"Scene Data (DPS {key}): {dps[key]}")
+        scene_keys = sorted({'25', '26', '27', '28', '29'} & dps.keys(), key=int)
+        if scene_keys:
+            print("\n".join(f"Scene Data (DPS {key}): {dps[key]}" for key in scene_keys))
             
         # Check if the device is in scene mode
         if '2' in dps:  # Mode is often in DPS 2
@@ -84,10 +84,9 @@ def main():
             else:
                 print(f"Device is in {mode} mode (not scene mode)")
         
-        # Print all DPS values for reference
+        # Print all DPS values for reference (as JSON, so it can be copied or parsed)
         print("\n\U0001F50E All DPS Values:")
-        for key, value in dps.items():
-            print(f"DPS {key}: {value}")
+        print(json.dumps(dps, indent=2, sort_keys=True))
             
     except Exception as e:
         print("\u274C Connection error:", e)
@@ -1,35 +1,75 @@
-import tinytuya
 import time
 import logging
 import socket
+import sys
+import threading
 from lib.Logger import log
 
 
-# Disable noisy tinytuya logging and make sure tinytuya debug off
-logging.getLogger("tinytuya").setLevel(logging.CRITICAL)
-tinytuya.set_debug(False)
+# tinytuya (and the requests/cryptography stack it pulls in) is imported on first use
+_tinytuya_mod = None
+
+def _tinytuya():
+    """Import tinytuya once, with its logging and debug output silenced."""
+    global _tinytuya_mod
+    if _tinytuya_mod is None:
+        import tinytuya
+        # Disable noisy tinytuya logging and make sure tinytuya debug off
+        logging.getLogger("tinytuya").setLevel(logging.CRITICAL)
+        tinytuya.set_debug(False)
+        _tinytuya_mod = tinytuya
+    return _tinytuya_mod
 
 # === Socket / timeouts ===
-# Global default socket timeout (sensible default)
-socket.setdefaulttimeout(2)
+# Timeout for the Tuya device socket only (the process-wide default is left alone)
+DEVICE_SOCKET_TIMEOUT: float = 2.0
+# tinytuya connect/receive retries (its default is 5, with 5s between connects). One
+# resend is enough to reconnect a stale persistent socket; a dead device fails in seconds
+# instead of holding the LED worker, and the failure backoff takes it from there.
+_SOCKET_RETRY_LIMIT: int = 1
+# TCP keepalive on the persistent socket (idle s, probe interval s, probe count):
+# a connection the device silently dropped is detected before the next LED change
+_KEEPALIVE = (15, 5, 3)
 
 # === Tuya defaults / globals ===
 DEVICE_ID: str | None = None
 DEVICE_IP: str | None = None
 LOCAL_KEY: str | None = None
 DEVICE_VER: float = 3.3
+# DEVICE_IP when it is a literal IPv4 address (the usual case), so the probe can skip name resolution
+_DEVICE_ADDR4: str | None = None
+# pause between the mode write and the color/scene write; only pre-3.3 firmware needs it
+_SETTLE_DELAY: float = 0.0
 
 # --- Reachability / backoff globals ---
 DEFAULT_TUYA_PORT = 6668
-# timestamp (epoch) of last failure to reach device
+# time.monotonic() of last failure to reach device (every timer here is monotonic:
+# only differences are compared, and NTP/clock changes must not skew the cooldowns)
 _last_failure_time: float = 0.0
-# when a failure occurs, skip further attempts for this many seconds (backoff)
-_failure_cooldown: float = 30.0
+# after a failure, skip further attempts for a cooldown that doubles with each
+# consecutive failure (min..max seconds) and resets on the next success
+_failure_backoff_min: float = 2.0
+_failure_backoff_max: float = 300.0
+_consecutive_failures: int = 0
 # cache last reachability check result and time (avoid too-frequent checks)
 _reachability_cache_ttl: float = 5.0
 _reachability_cache_time: float = 0.0
 _reachability_cache_result: bool = False
 
+# --- Persistent device handle ---
+# one BulbDevice (and its socket) is shared by every set_led call
+_device = None
+# set after a socket error; the stale socket is dropped on the next call
+_device_dirty: bool = False
+_device_lock = threading.Lock()
+# (color, speed) the device last acknowledged and when; repeats within the TTL are
+# skipped without I/O, later ones are re-sent in case the strip was changed elsewhere
+_last_sent: tuple | None = None
+_last_sent_time: float = 0.0
+LAST_SENT_TTL: float = 2.0
+# socket object _tune_socket last configured (tinytuya opens a new one per reconnect)
+_tuned_socket = None
+
 # === Colors mapping ===
 COLORS = {
     'red': (255, 0, 0),
@@ -70,50 +110,137 @@ SPEEDS = {
     'slow': '3c3c'
 }
 
+# === Scene payloads (DPS 25), {spd} is the speed code ===
+_SCENE_TEMPLATES = {
+    'red_alert': "c9{spd}01000003e803e800000000{spd}0100ec00000000000000",
+    'orange_alert': "c9{spd}01000b03e803e800000000{spd}01000b00000000000000",
+#    'fsd_jump': "c9{spd}0100d703e803e800000000{spd}01006600000000000000",
+    'fsd_jump': "0447470200f803e803e80000000047470200b703e803e800000000474702008b03e803e80000000047470200b903e803e800000000",
+#    'breathing_yellow': "c9{spd}0100d703e803e800000000{spd}01ffff66000000000000",
+    'breathing_yellow': "07464602000003e803e800000000464602003703e803e800000000",
+    'breathing_bluegreen': "065f5f0200bc03e803e8000000005f5f02007803e803e800000000",
+}
+# every (scene, speed) payload, built once; unknown speeds fall back to 'normal'
+SCENE_DPS = {
+    (scene, speed): sys.intern(tpl.format(spd=spd))
+    for scene, tpl in _SCENE_TEMPLATES.items()
+    for speed, spd in SPEEDS.items()
+}
+# a typo in a payload fails here, at import, rather than on the device mid-game
+for _key, _payload in SCENE_DPS.items():
+    try:
+        bytes.fromhex(_payload)
+    except ValueError:
+        raise ValueError(f"Invalid scene DPS payload for {_key}: {_payload!r}") from None
+del _key, _payload
+# plain RGB entries of COLORS (scene aliases excluded)
+_RGB_COLORS = {k: v for k, v in COLORS.items() if isinstance(v, tuple)}
+# COLORS names that stand for another scene, e.g. 'under attack' -> 'red_alert'
+_COLOR_ALIASES = {k: v for k, v in COLORS.items() if isinstance(v, str) and k != v}
+
 # === Configuration setter ===
 def configure(device_id: str, device_ip: str, local_key: str, device_ver: float = 3.3):
     """Set Tuya device parameters from plugin settings"""
-    global DEVICE_ID, DEVICE_IP, LOCAL_KEY, DEVICE_VER
-    DEVICE_ID = device_id or None
-    DEVICE_IP = device_ip or None
-    LOCAL_KEY = local_key or None
+    global DEVICE_ID, DEVICE_IP, LOCAL_KEY, DEVICE_VER, _SETTLE_DELAY, _DEVICE_ADDR4
+    global _consecutive_failures, _last_failure_time, _reachability_cache_time
     try:
-        DEVICE_VER = float(device_ver)
+        ver = float(device_ver)
     except Exception:
-        DEVICE_VER = 3.3
+        ver = 3.3
+    try:
+        socket.inet_pton(socket.AF_INET, device_ip)
+        addr4 = device_ip
+    except (OSError, TypeError, ValueError):
+        addr4 = None
+    # swap the whole configuration under the device lock: init_device runs under it
+    # too, so the worker never builds a device from a half-updated id/ip/key
+    with _device_lock:
+        _reset_device_locked()
+        DEVICE_ID = device_id or None
+        DEVICE_IP = device_ip or None
+        LOCAL_KEY = local_key or None
+        DEVICE_VER = ver
+        _DEVICE_ADDR4 = addr4
+        _SETTLE_DELAY = 0.2 if ver < 3.3 else 0.0
+        # failures and reachability belonged to the old configuration: start over
+        _consecutive_failures = 0
+        _last_failure_time = 0.0
+        _reachability_cache_time = 0.0
+
+def _record_failure():
+    """Start (or extend) the failure cooldown; the next check after it probes again."""
+    global _last_failure_time, _consecutive_failures, _reachability_cache_time
+    _consecutive_failures += 1
+    _last_failure_time = time.monotonic()
+    _reachability_cache_time = 0.0
+
+def _record_reachable():
+    """Count a successful check as fresh reachability; the failure backoff is kept."""
+    global _reachability_cache_time, _reachability_cache_result
+    _reachability_cache_time = time.monotonic()
+    _reachability_cache_result = True
+
+def _record_success():
+    """The device acknowledged a command: clear the failure backoff as well."""
+    global _last_failure_time, _consecutive_failures
+    _consecutive_failures = 0
+    _last_failure_time = 0.0
+    _record_reachable()
+
+def _failure_cooldown() -> float:
+    """Current cooldown in seconds after the last failure."""
+    n = max(_consecutive_failures - 1, 0)
+    return min(_failure_backoff_max, _failure_backoff_min * (2 ** min(n, 16)))
+
+def retry_delay() -> float | None:
+    """Seconds until a failed set_led is worth retrying (the rest of the cooldown),
+    or None when the last failure was not the device's (e.g. an unknown color)."""
+    if not _last_failure_time:
+        return None
+    return max(0.1, _failure_cooldown() - (time.monotonic() - _last_failure_time))
 
 def _check_tcp_connectivity(ip: str, port: int = DEFAULT_TUYA_PORT, timeout: float = 1.5) -> bool:
     """Fast TCP connect test to detect unreachable IP/port (fails fast)."""
     try:
         if not ip:
             return False
+        if ip == _DEVICE_ADDR4:
+            # literal IPv4: plain connect, no getaddrinfo round
+            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+                s.settimeout(timeout)
+                return s.connect_ex((ip, port)) == 0
         with socket.create_connection((ip, port), timeout=timeout):
             return True
     except Exception:
         return False
 
-def is_reachable() -> bool:
+def is_reachable(probe: bool = True) -> bool:
     """Public helper to quickly determine if the configured device is reachable.
-    Uses a small cache and a failure cooldown to avoid repeated slow attempts."""
-    global _last_failure_time, _reachability_cache_time, _reachability_cache_result
-
+    Uses a small cache and a failure cooldown to avoid repeated slow attempts.
+    With probe=False it never blocks: a stale cache reads as reachable and the
+    next set_led call does the real check."""
     if not DEVICE_IP:
         return False
 
-    now = time.time()
+    now = time.monotonic()
     # If we had a recent failure within cooldown, don't try again yet
-    if _last_failure_time and (now - _last_failure_time) < _failure_cooldown:
+    if _last_failure_time and (now - _last_failure_time) < _failure_cooldown():
         return False
 
     # Use cached reachable result if fresh
     if (_reachability_cache_time and (now - _reachability_cache_time) < _reachability_cache_ttl):
         return _reachability_cache_result
 
+    if not probe:
+        return True
+
     result = _check_tcp_connectivity(DEVICE_IP, DEFAULT_TUYA_PORT, timeout=1.5)
-    _reachability_cache_time = now
-    _reachability_cache_result = result
-    if not result:
-        _last_failure_time = now
+    # success refreshes the cache; failure starts the cooldown, which gates the next probe.
+    # An open port alone doesn't end the backoff: a wrong key or version still connects.
+    if result:
+        _record_reachable()
+    else:
+        _record_failure()
     return result
 
 # === Initialize the Tuya Bulb device ===
@@ -129,84 +256,185 @@ def init_device():
             log("warn", "[EliteLEDPlugin] LED device configuration incomplete, skipping init.")
             return None
 
-        d = tinytuya.BulbDevice(DEVICE_ID, DEVICE_IP, LOCAL_KEY)
+        d = _tinytuya().BulbDevice(DEVICE_ID, DEVICE_IP, LOCAL_KEY)
         d.set_version(DEVICE_VER)
+        d.set_socketTimeout(DEVICE_SOCKET_TIMEOUT)
+        d.set_socketRetryLimit(_SOCKET_RETRY_LIMIT)
         # prefer persistent socket to avoid reconnect overhead when possible
         d.set_socketPersistent(True)
+        # small control packets: don't let Nagle hold them back
+        d.set_socketNODELAY(True)
         return d
     except Exception as e:
         # record failure time to apply cooldown/backoff
-        global _last_failure_time
-        _last_failure_time = time.time()
+        _record_failure()
         log("error", f"[EliteLEDPlugin] Error connecting to LED device: {e}")
         return None
 
+def _reset_device_locked():
+    """Close and forget the shared device (configuration changed). Caller holds _device_lock."""
+    global _device, _device_dirty, _last_sent, _tuned_socket
+    if _device is not None:
+        try:
+            _device.close()
+        except Exception:
+            pass
+    _device = None
+    _device_dirty = False
+    _last_sent = None
+    _tuned_socket = None
+
+def _tune_socket(d):
+    """Enable TCP keepalive on the device's current socket, once per connection."""
+    global _tuned_socket
+    sock = getattr(d, "socket", None)
+    if sock is None or sock is _tuned_socket:
+        return
+    _tuned_socket = sock
+    idle, interval, count = _KEEPALIVE
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        if hasattr(socket, "TCP_KEEPIDLE"):
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, idle)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, interval)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPCNT, count)
+        elif hasattr(socket, "SIO_KEEPALIVE_VALS"):
+            # Windows: (on, idle ms, interval ms); the probe count is fixed by the OS
+            sock.ioctl(socket.SIO_KEEPALIVE_VALS, (1, idle * 1000, interval * 1000))
+    except (OSError, AttributeError):
+        pass
+
+def _get_device_locked():
+    """Return the shared device, building it if needed. Caller holds _device_lock."""
+    global _device, _device_dirty
+    if _device is None:
+        _device = init_device()
+    elif _device_dirty:
+        # drop the broken socket; tinytuya reconnects lazily on the next command
+        _device.close()
+        _device_dirty = False
+    return _device
+
 # === Set LED color or scene ===
+class TuyaCommandError(Exception):
+    """tinytuya answered a command with an error dict instead of an acknowledgement."""
+
+def _ack(result):
+    """Pass a tinytuya command result through, raising if it is an error dict.
+    tinytuya catches socket errors itself (ERR_CONNECT, ERR_KEY_OR_VER, ...) and
+    returns them, so this is the only place a lost device shows up."""
+    if isinstance(result, dict) and "Error" in result:
+        raise TuyaCommandError(f"{result.get('Error')} (Err {result.get('Err')})")
+    return result
+
+# Type B (protocol 3.3+) data points used by the scene payloads
+_DP_SWITCH = 20
+_DP_MODE = 21
+_DP_SCENE = 25
+
+def _write_colour(d, r: int, g: int, b: int) -> bool:
+    """Colour mode + RGB + power on; set_colour sends all three DPs in one write."""
+    if _SETTLE_DELAY:
+        # older firmware wants the mode switched (and settled) before the colour
+        _ack(d.set_mode('colour'))
+        time.sleep(_SETTLE_DELAY)
+    _ack(d.set_colour(r, g, b))
+    return True
+
+def _write_scene(d, dps_value: str) -> bool:
+    """Scene mode + scene data + power on."""
+    if _SETTLE_DELAY:
+        _ack(d.set_mode('scene'))
+        time.sleep(_SETTLE_DELAY)
+        _ack(d.set_value(_DP_SCENE, dps_value))
+        _ack(d.turn_on())
+    else:
+        # one control packet instead of three request/response round trips
+        _ack(d.set_multiple_values({_DP_SWITCH: True, _DP_MODE: 'scene', _DP_SCENE: dps_value}))
+    return True
+
+def _send(d, color: str, speed: str) -> bool:
+    """Issue the tinytuya commands for one color/scene on an open device."""
+    if color == 'off':
+        _ack(d.turn_off())
+        return True
+    elif color == 'on':
+        return _write_colour(d, 255, 255, 255)
+    elif color in _SCENE_TEMPLATES:
+        dps_value = SCENE_DPS.get((color, speed)) or SCENE_DPS[(color, 'normal')]
+        return _write_scene(d, dps_value)
+    else:
+        rgb = _RGB_COLORS.get(color)
+        if rgb is not None:
+            return _write_colour(d, *rgb)
+        # unknown color/scene
+        log("warn", f"[EliteLEDPlugin] Unknown color/scene requested: {color}")
+        return False
+
 def set_led(color: str, speed: str = "normal") -> bool:
     """Set the LED strip to a color or scene. Returns boolean success."""
-    # Quick reachable check before doing tinytuya calls
-    if not is_reachable():
+    global _last_sent, _last_sent_time
+    color = _COLOR_ALIASES.get(color, color)
+    now = time.monotonic()
+    # 'on'/'off' are explicit commands and always go to the device
+    if (color not in ('on', 'off') and _last_sent == (color, speed)
+            and now - _last_sent_time < LAST_SENT_TTL):
+        return True
+
+    # Quick reachable check before doing tinytuya calls. An open, healthy device skips
+    # the TCP probe (a second connection some firmware refuses): a failed send surfaces
+    # through _ack and marks it dirty. The failure cooldown applies either way.
+    if not is_reachable(probe=_device is None or _device_dirty):
         log("warn", "[EliteLEDPlugin] LED device unreachable, skipping set_led.")
         return False
 
-    d = init_device()
-    if not d:
-        log("error", "[EliteLEDPlugin] LED device not initialized, skipping LED setting.")
-        return False
+    with _device_lock:
+        d = _get_device_locked()
+        if not d:
+            log("error", "[EliteLEDPlugin] LED device not initialized, skipping LED setting.")
+            return False
 
-    try:
-        if color == 'off':
-            d.turn_off()
-            return True
-        elif color == 'on':
-            d.set_mode('colour')
-            time.sleep(0.2)
-            d.set_colour(255, 255, 255)
-            d.turn_on()
-            return True
-        elif color in ['red_alert', 'orange_alert', 'fsd_jump', 'breathing_yellow', 'breathing_bluegreen']:
-            d.set_mode('scene')
-            time.sleep(0.2)
-            spd = SPEEDS.get(speed, SPEEDS['normal'])
-
-            if color == 'red_alert':
-                dps_value = f"c9{spd}01000003e803e800000000{spd}0100ec00000000000000"
-                d.set_value(25, dps_value)
-            elif color == 'orange_alert':
-                dps_value = f"c9{spd}01000b03e803e800000000{spd}01000b00000000000000"
-                d.set_value(25, dps_value)
-            elif color == 'fsd_jump':
-                spd = SPEEDS.get(speed, SPEEDS['slow'])
-#                dps_value = f"c9{spd}0100d703e803e800000000{spd}01006600000000000000"
-                dps_value = f"0447470200f803e803e80000000047470200b703e803e800000000474702008b03e803e80000000047470200b903e803e800000000"
-                d.set_value(25, dps_value)
-            elif color == 'breathing_yellow':
-                spd = SPEEDS.get(speed, SPEEDS['slow'])
-#                dps_value = f"c9{spd}0100d703e803e800000000{spd}01ffff66000000000000"
-                dps_value = f"07464602000003e803e800000000464602003703e803e800000000"
-                d.set_value(25, dps_value)
-            elif color == 'breathing_bluegreen':
-                spd = SPEEDS.get(speed, SPEEDS['slow'])
-                dps_value = f"065f5f0200bc03e803e8000000005f5f02007803e803e800000000"
-                d.set_value(25, dps_value)
-
-            d.turn_on()
-            return True
-        else:
-            rgb = COLORS.get(color)
-            if isinstance(rgb, tuple):
-                d.set_mode('colour')
-                time.sleep(0.2)
-                d.set_colour(*rgb)
-                d.turn_on()
-                return True
-            # unknown color/scene
-            log("warn", f"[EliteLEDPlugin] Unknown color/scene requested: {color}")
+        _last_sent = None
+        try:
+            ok = _send(d, color, speed)
+        except Exception as e:
+            _device_failed_locked()
+            log("error", f"[EliteLEDPlugin] Connection error setting {color}: {e}")
             return False
-    except Exception as e:
-        # record failure time to apply cooldown/backoff
-        global _last_failure_time
-        _last_failure_time = time.time()
-        log("error", f"[EliteLEDPlugin] Error setting {color}: {e}")
-        return False
+        if ok:
+            # the device acknowledged every write of this command
+            _last_sent = (color, speed)
+            _last_sent_time = now
+            _device_acked_locked(d)
+    return ok
+
+def _device_failed_locked():
+    """Error dict (TuyaCommandError), socket error or failed bulb detection: reconnect
+    lazily and start the backoff. Caller holds _device_lock."""
+    global _device_dirty
+    _device_dirty = True
+    _record_failure()
+
+def _device_acked_locked(d):
+    """The device answered: tune the socket and count it as a fresh reachability check.
+    Caller holds _device_lock."""
+    _tune_socket(d)
+    _record_success()
 
+def warm_up() -> bool:
+    """Open the device socket ahead of the first LED change.
+    tinytuya connects lazily on the first command, so this sends a status() query:
+    it opens the persistent socket and lets BulbDevice detect the bulb type that
+    set_colour needs. Returns True if the device answered."""
+    with _device_lock:
+        d = _get_device_locked()
+        if not d:
+            return False
+        try:
+            _ack(d.status())
+        except Exception as e:
+            _device_failed_locked()
+            log("error", f"[EliteLEDPlugin] Connection error opening LED device: {e}")
+            return False
+        _device_acked_locked(d)
+    return True